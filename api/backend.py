@@ -8,17 +8,21 @@ current_dir = Path(__file__).parent
 backend_path = current_dir.parent / "backend"
 sys.path.insert(0, str(backend_path))
 
-def handler(event, context):
+# Built once per container on the first invocation and reused by every later one
+_mangum_handler = None
+
+def get_mangum_handler():
     """
-    Optimized Vercel handler for FastAPI backend
+    Import the FastAPI app and wrap it in a Mangum adapter, once per container
     """
-    try:
+    global _mangum_handler
+    if _mangum_handler is None:
         # Try to import and use Mangum
         from mangum import Mangum
         from main import app
         
         # Create optimized Mangum handler for Vercel
-        mangum_handler = Mangum(
+        _mangum_handler = Mangum(
             app, 
             lifespan="off",
             api_gateway_base_path=None,
@@ -29,8 +33,14 @@ def handler(event, context):
                 "application/vnd.api+json",
             ]
         )
-        
-        return mangum_handler(event, context)
+    return _mangum_handler
+
+def handler(event, context):
+    """
+    Optimized Vercel handler for FastAPI backend
+    """
+    try:
+        return get_mangum_handler()(event, context)
         
     except ImportError as e:
         # Mangum not available
@@ -0,0 +1,126 @@
+"""
+Cold-start benchmark for the Vercel entry point (api/backend.py).
+
+Every sample runs in a fresh Python process, as a new serverless container would,
+and measures:
+- entry_import_ms: importing api/backend.py
+- first_request_ms: the first invocation (imports the app, builds the adapter, serves GET /)
+- warm_request_ms: a second invocation in the same process
+It also reports which heavy SDKs were imported by the time the first request finished.
+
+Usage:
+    python backend/benchmarks/cold_start.py --samples 20
+    python backend/benchmarks/cold_start.py --max-first-request-ms 800   # exit 1 on regression
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+ENTRY_POINT = REPO_ROOT / "api" / "backend.py"
+HEAVY_MODULES = ["openai", "supabase", "httpx", "tiktoken"]
+
+PROBE = r"""
+import sys, time, json, importlib.util
+
+t0 = time.perf_counter()
+spec = importlib.util.spec_from_file_location("vercel_entry", sys.argv[1])
+entry = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(entry)
+t1 = time.perf_counter()
+
+event = {
+    "resource": "/", "path": "/", "httpMethod": "GET",
+    "headers": {"host": "localhost"}, "multiValueHeaders": {},
+    "queryStringParameters": None, "multiValueQueryStringParameters": None,
+    "pathParameters": None, "stageVariables": None,
+    "requestContext": {"resourcePath": "/", "httpMethod": "GET", "path": "/", "stage": "bench",
+                       "identity": {"sourceIp": "127.0.0.1"}},
+    "body": None, "isBase64Encoded": False,
+}
+
+class Context:
+    function_name = "cold-start-benchmark"
+
+first = entry.handler(event, Context())
+t2 = time.perf_counter()
+loaded = [name for name in json.loads(sys.argv[2]) if name in sys.modules]
+entry.handler(event, Context())
+t3 = time.perf_counter()
+
+print(json.dumps({
+    "status": first.get("statusCode"),
+    "entry_import_ms": (t1 - t0) * 1000,
+    "first_request_ms": (t2 - t1) * 1000,
+    "warm_request_ms": (t3 - t2) * 1000,
+    "heavy_modules_loaded": loaded,
+}))
+"""
+
+
+def run_sample() -> dict:
+    env = dict(os.environ, VERCEL="1")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, str(ENTRY_POINT), json.dumps(HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=str(REPO_ROOT)
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Probe failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=10, help="number of fresh processes to measure")
+    parser.add_argument("--max-entry-import-ms", type=float, help="fail if p99 entry import time exceeds this")
+    parser.add_argument("--max-first-request-ms", type=float, help="fail if p99 first-request latency exceeds this")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    samples = [run_sample() for _ in range(args.samples)]
+    if any(sample["status"] != 200 for sample in samples):
+        print(f"Entry point returned non-200 statuses: {[s['status'] for s in samples]}", file=sys.stderr)
+        sys.exit(1)
+
+    summary = {"samples": len(samples), "heavy_modules_loaded": samples[-1]["heavy_modules_loaded"]}
+    for metric in ("entry_import_ms", "first_request_ms", "warm_request_ms"):
+        values = [sample[metric] for sample in samples]
+        summary[metric] = {
+            "p50": round(percentile(values, 50), 2),
+            "p99": round(percentile(values, 99), 2),
+            "max": round(max(values), 2),
+        }
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"Cold start over {summary['samples']} fresh processes")
+        for metric in ("entry_import_ms", "first_request_ms", "warm_request_ms"):
+            stats = summary[metric]
+            print(f"  {metric:<18} p50={stats['p50']:>9.2f}  p99={stats['p99']:>9.2f}  max={stats['max']:>9.2f}")
+        print(f"  heavy SDKs imported by first request: {', '.join(summary['heavy_modules_loaded']) or 'none'}")
+
+    failures = []
+    if args.max_entry_import_ms is not None and summary["entry_import_ms"]["p99"] > args.max_entry_import_ms:
+        failures.append(f"entry import p99 {summary['entry_import_ms']['p99']}ms > {args.max_entry_import_ms}ms")
+    if args.max_first_request_ms is not None and summary["first_request_ms"]["p99"] > args.max_first_request_ms:
+        failures.append(f"first request p99 {summary['first_request_ms']['p99']}ms > {args.max_first_request_ms}ms")
+    if failures:
+        print("Cold-start regression: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Offline throughput benchmark for the report endpoints.
+
+Boots the FastAPI app in-process against local stand-ins for Supabase (PostgREST),
+OpenAI (chat completions) and the Make.com webhook (see stubs.py), then drives
+/generate-live-report, /craft-email and /send-pending-emails with concurrent
+requests, and /generate-batch-report with one request covering as many meetings. Each scenario gets its own freshly seeded meetings, so runs are not
+shortened by email deduplication. For every scenario it reports:
+- throughput (requests/s and emails/s)
+- request latency p50/p95/p99/max
+- how long the background dispatcher took to deliver the queued emails
+- outbound calls to each dependency, by operation and status
+
+The stubs' latency, error rate and rate limit, and the share of very slow LLM
+calls, are configurable, so slow or flaky dependencies can be reproduced on a laptop.
+
+Usage:
+    python backend/benchmarks/report_throughput.py --requests 20 --concurrency 5 --recipients 10
+    python backend/benchmarks/report_throughput.py --scenarios live --llm-latency-ms 800 --llm-rate-limit-rps 20
+    python backend/benchmarks/report_throughput.py --transcript-words 30000 --json
+    python backend/benchmarks/report_throughput.py --scenarios live --llm-slow-rate 0.05 --llm-slow-ms 8000
+    python backend/benchmarks/report_throughput.py --scenarios send --webhook-batch-size 25
+    python backend/benchmarks/report_throughput.py --scenarios batch --requests 500 --recipients 5
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stubs import FaultProfile, PostgRESTStub, ChatCompletionsStub, WebhookSink  # noqa: E402
+
+SCENARIOS = ("live", "craft", "send", "batch")
+ENDPOINTS = {"live": "/generate-live-report", "craft": "/craft-email", "send": "/send-pending-emails", "batch": "/generate-batch-report"}
+WORDS = ("release", "timeline", "customer", "feedback", "budget", "roadmap", "design", "review", "deadline",
+         "migration", "testing", "launch", "metrics", "onboarding", "support", "hiring", "priority", "risk")
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_transcript(speakers, words: int, seed: str) -> str:
+    """A speaker-turn transcript of roughly `words` words, different for every seed."""
+    rng = random.Random(seed)
+    lines = [f"{speakers[0]}: This is meeting {seed}."]
+    written = 6
+    while written < words:
+        turn = [rng.choice(WORDS) for _ in range(rng.randint(8, 40))]
+        lines.append(f"{rng.choice(speakers)}: {' '.join(turn)}.")
+        written += len(turn) + 1
+    return "\n".join(lines)
+
+
+def seed_meetings(db: PostgRESTStub, scenario: str, count: int, recipients: int, transcript_words: int, users):
+    """One meeting per request, with a transcript and `recipients` participants each."""
+    requests = []
+    for index in range(count):
+        organizer = users[0]["email"]
+        meeting = db.seed("meetings", [{
+            "user_email": organizer,
+            "meeting_title": f"Benchmark {scenario} meeting {index}",
+            "status": "completed"
+        }])[0]
+        participants = [{
+            "meeting_id": meeting["id"],
+            "participant_name": user["full_name"],
+            "participant_email": user["email"]
+        } for user in users[:recipients]]
+        db.seed("meeting_participants", participants)
+        db.seed("transcripts", [{
+            "meeting_id": meeting["id"],
+            "transcript_text": make_transcript([p["participant_name"] for p in participants], transcript_words, seed=f"{scenario}-{index}")
+        }])
+        if scenario in ("live", "batch"):
+            requests.append({"user_email": organizer, "meeting_id": meeting["id"]})
+        else:
+            requests.append({"meeting_id": meeting["id"]})
+    return requests
+
+
+def seed_pending_emails(db: PostgRESTStub, count: int, users):
+    meeting = db.seed("meetings", [{"user_email": users[0]["email"], "meeting_title": "Benchmark send meeting"}])[0]
+    db.seed("email_notifications", [{
+        "meeting_id": meeting["id"],
+        "user_email": users[index % len(users)]["email"],
+        "from_email": "bench@example.com",
+        "subject": f"Benchmark email {index}",
+        "html_content": "<p>Benchmark</p>",
+        "status": "pending"
+    } for index in range(count)])
+
+
+async def drive(app, path: str, bodies, concurrency: int):
+    """Sends every body to `path` with at most `concurrency` requests in flight."""
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one(client, body):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(path, json=body)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[one(client, body) for body in bodies])
+        elapsed = time.perf_counter() - started
+    return elapsed, latencies, statuses
+
+
+async def wait_for_delivery(db: PostgRESTStub, timeout: float) -> bool:
+    """Waits until no email is pending or being sent; False if `timeout` passed first."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        rows = list(db.tables.get("email_notifications", []))
+        if not any(row.get("status") in ("pending", "sending") for row in rows):
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+async def run_scenario(main, scenario: str, args, stubs, users) -> dict:
+    db, llm_stub, webhook = stubs
+    db.clear("email_notifications")
+    if scenario == "send":
+        seed_pending_emails(db, args.requests * args.recipients, users)
+        bodies = [None] * args.requests
+    elif scenario == "batch":
+        bodies = [{"reports": seed_meetings(db, scenario, args.requests, args.recipients, args.transcript_words, users)}]
+    else:
+        bodies = seed_meetings(db, scenario, args.requests, args.recipients, args.transcript_words, users)
+    for stub in stubs:
+        stub.reset_counts()
+    delivered_before = webhook.delivered
+
+    started = time.perf_counter()
+    elapsed, latencies, statuses = await drive(main.app, ENDPOINTS[scenario], bodies, args.concurrency)
+    drained = await wait_for_delivery(db, args.delivery_timeout)
+    delivery_elapsed = time.perf_counter() - started
+
+    emails_queued = len(db.tables.get("email_notifications", []))
+    emails_delivered = webhook.delivered - delivered_before
+    return {
+        "scenario": scenario,
+        "endpoint": ENDPOINTS[scenario],
+        "requests": len(bodies),
+        "meetings": args.requests if scenario != "send" else None,
+        "concurrency": args.concurrency,
+        "recipients": args.recipients,
+        "transcript_words": args.transcript_words if scenario != "send" else None,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(bodies) / elapsed, 2),
+        "emails_queued": emails_queued,
+        "emails_delivered": emails_delivered,
+        "emails_per_s": round(max(emails_queued, emails_delivered) / elapsed, 2),
+        "delivery_s": round(delivery_elapsed, 3) if drained else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2)
+        },
+        "outbound_calls": {stub.name: stub.call_counts() for stub in stubs}
+    }
+
+
+def configure_environment(args, stubs):
+    """Points the app at the stubs; must run before the app is imported."""
+    db, llm_stub, webhook = stubs
+    os.environ.update({
+        "SUPABASE_URL": db.url,
+        "SUPABASE_ANON_KEY": "benchmark-key",
+        "OPENAI_API_KEY": "benchmark-key",
+        "OPENAI_BASE_URL": f"{llm_stub.url}/v1",
+        "MAKE_WEBHOOK_URL": f"{webhook.url}/webhook",
+        "LLM_CACHE_BACKEND": "memory" if args.llm_cache else "none",
+        "WEBHOOK_BATCH_SIZE": str(args.webhook_batch_size),
+    })
+
+
+async def run(args) -> list:
+    stubs = (
+        PostgRESTStub(FaultProfile(args.db_latency_ms, args.db_latency_ms / 4, args.db_error_rate, args.db_rate_limit_rps)).start(),
+        ChatCompletionsStub(FaultProfile(
+            args.llm_latency_ms, args.llm_latency_ms / 4, args.llm_error_rate, args.llm_rate_limit_rps, args.llm_slow_rate, args.llm_slow_ms
+        )).start(),
+        WebhookSink(FaultProfile(args.webhook_latency_ms, args.webhook_latency_ms / 4, args.webhook_error_rate, args.webhook_rate_limit_rps)).start(),
+    )
+    try:
+        configure_environment(args, stubs)
+        sys.path.insert(0, str(BACKEND_DIR))
+        import logging
+        logging.disable(logging.WARNING if args.verbose else logging.CRITICAL)
+        import main
+
+        users = stubs[0].seed("users", [{
+            "email": f"user{index}@example.com",
+            "full_name": f"User {index}",
+            "monitoring_enabled": True
+        } for index in range(args.recipients)])
+
+        results = []
+        async with main.lifespan(main.app):
+            for scenario in args.scenarios:
+                results.append(await run_scenario(main, scenario, args, stubs, users))
+        return results
+    finally:
+        for stub in stubs:
+            stub.stop()
+
+
+def print_result(result: dict):
+    latency = result["latency_ms"]
+    if result["scenario"] == "batch":
+        print(f"{result['endpoint']}  (1 request for {result['meetings']} meetings x {result['recipients']} recipients)")
+    else:
+        print(f"{result['endpoint']}  ({result['requests']} requests x {result['recipients']} recipients, concurrency {result['concurrency']})")
+    print(f"  statuses         {result['statuses']}")
+    print(f"  throughput       {result['requests_per_s']:.2f} req/s, {result['emails_per_s']:.2f} emails/s "
+          f"({result['emails_queued']} queued in {result['elapsed_s']}s)")
+    delivery = f"{result['delivery_s']}s" if result["delivery_s"] is not None else "timed out"
+    print(f"  delivery         {result['emails_delivered']} delivered, queue drained after {delivery}")
+    print(f"  latency_ms       p50={latency['p50']:.2f}  p95={latency['p95']:.2f}  p99={latency['p99']:.2f}  max={latency['max']:.2f}")
+    for name, calls in result["outbound_calls"].items():
+        total = sum(calls.values())
+        detail = ", ".join(f"{operation}={count}" for operation, count in calls.items()) or "none"
+        print(f"  {name:<16} {total:>5} calls: {detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=10, help="requests per scenario (meetings in the batch request for batch)")
+    parser.add_argument("--concurrency", type=int, default=5, help="requests in flight at once")
+    parser.add_argument("--recipients", type=int, default=10, help="recipients (monitored users / participants) per report")
+    parser.add_argument("--transcript-words", type=int, default=2000, help="approximate transcript size")
+    parser.add_argument("--llm-cache", action="store_true", help="enable the in-memory LLM cache (off by default)")
+    parser.add_argument("--webhook-batch-size", type=int, default=1, help="emails per webhook request (1 = one request per email)")
+    parser.add_argument("--delivery-timeout", type=float, default=60.0, help="seconds to wait for the dispatcher to drain the queue")
+    for service, latency in (("db", 5.0), ("llm", 300.0), ("webhook", 50.0)):
+        parser.add_argument(f"--{service}-latency-ms", type=float, default=latency, help=f"mean {service} stub latency")
+        parser.add_argument(f"--{service}-error-rate", type=float, default=0.0, help=f"fraction of {service} calls answered with 503")
+        parser.add_argument(f"--{service}-rate-limit-rps", type=float, default=0.0, help=f"{service} requests per second before 429s (0 = unlimited)")
+    parser.add_argument("--llm-slow-rate", type=float, default=0.0, help="fraction of llm calls with an extra --llm-slow-ms of latency")
+    parser.add_argument("--llm-slow-ms", type=float, default=5000.0, help="extra latency of slow llm calls")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the app's warnings and errors")
+    args = parser.parse_args()
+    args.scenarios = [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print_result(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Local stand-ins for the backend's outbound dependencies, for offline benchmarks.
+
+- `PostgRESTStub`: an in-memory subset of the Supabase REST API (PostgREST):
+  select/insert/upsert/update/delete with eq/neq/gt/gte/lt/lte/in/is filters,
+  order, limit, exact counts, and the `claim_email_notifications` RPC.
+- `ChatCompletionsStub`: an OpenAI-compatible `/v1/chat/completions` endpoint that
+  answers JSON-schema, JSON-object and plain-text requests with canned content.
+- `WebhookSink`: accepts Make.com-style delivery webhooks, single emails or
+  arrays of emails (answered with per-item results).
+
+Each server runs on 127.0.0.1 in a background thread and applies a `FaultProfile`
+(latency, jitter, a slow tail, error rate, requests-per-second limit answered with
+429 and Retry-After) to every request. Calls are counted per operation and status.
+"""
+import json
+import time
+import uuid
+import random
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qsl
+
+
+@dataclass
+class FaultProfile:
+    """How a stub misbehaves: added latency, random failures and a request-rate limit."""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rps: float = 0.0  # 0 disables rate limiting
+    slow_rate: float = 0.0  # fraction of requests delayed by an extra slow_ms, a long latency tail
+    slow_ms: float = 0.0
+
+    def delay(self) -> float:
+        delay_ms = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if self.slow_rate and random.random() < self.slow_rate:
+            delay_ms += self.slow_ms
+        return max(0.0, delay_ms) / 1000
+
+
+class _RateLimit:
+    """Token bucket allowing `rps` requests per second with a one-second burst."""
+
+    def __init__(self, rps: float):
+        self.rps = rps
+        self.available = rps
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> float:
+        """Takes a token and returns 0, or returns the seconds until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(self.rps, self.available + (now - self.updated_at) * self.rps)
+            self.updated_at = now
+            if self.available >= 1:
+                self.available -= 1
+                return 0.0
+            return (1 - self.available) / self.rps
+
+
+class StubServer:
+    """A threaded HTTP server that applies a fault profile and counts calls."""
+
+    name = "stub"
+
+    def __init__(self, faults: Optional[FaultProfile] = None):
+        self.faults = faults or FaultProfile()
+        self.calls: Counter = Counter()
+        self._calls_lock = threading.Lock()
+        self._rate_limit = _RateLimit(self.faults.rate_limit_rps) if self.faults.rate_limit_rps > 0 else None
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _serve(self):
+                length = int(self.headers.get("content-length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, headers, payload = stub._handle(self.command, self.path, self.headers, body)
+                try:
+                    self.send_response(status)
+                    for key, value in headers.items():
+                        self.send_header(key, value)
+                    self.send_header("content-length", str(len(payload)))
+                    self.end_headers()
+                    if self.command != "HEAD":
+                        self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up on the request, e.g. a cancelled hedge
+                    self.close_connection = True
+
+            do_GET = do_HEAD = do_POST = do_PATCH = do_DELETE = _serve
+
+        class Server(ThreadingHTTPServer):
+            # socketserver's default backlog of 5 drops bursts of concurrent connects
+            request_queue_size = 1024
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"{self.name}-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def reset_counts(self):
+        with self._calls_lock:
+            self.calls.clear()
+
+    def call_counts(self) -> Dict[str, int]:
+        with self._calls_lock:
+            return dict(sorted(self.calls.items()))
+
+    def _count(self, operation: str, status: int):
+        with self._calls_lock:
+            self.calls[f"{operation} {status}"] += 1
+
+    def _handle(self, method: str, path: str, headers, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        operation = self.describe(method, path)
+        time.sleep(self.faults.delay())
+        if self._rate_limit is not None:
+            wait = self._rate_limit.retry_after()
+            if wait > 0:
+                self._count(operation, 429)
+                return 429, {"content-type": "application/json", "retry-after": f"{wait:.3f}"}, self.error_body("rate limited")
+        if self.faults.error_rate and random.random() < self.faults.error_rate:
+            self._count(operation, 503)
+            return 503, {"content-type": "application/json"}, self.error_body("injected failure")
+        try:
+            status, response_headers, payload = self.respond(method, path, headers, body)
+        except Exception as e:
+            status, response_headers, payload = 500, {"content-type": "application/json"}, self.error_body(str(e))
+        self._count(operation, status)
+        return status, response_headers, payload
+
+    def describe(self, method: str, path: str) -> str:
+        return f"{method} {urlsplit(path).path}"
+
+    def error_body(self, message: str) -> bytes:
+        return json.dumps({"error": {"message": message}}).encode()
+
+    def respond(self, method: str, path: str, headers, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        raise NotImplementedError
+
+
+def _now_iso(offset_seconds: float = 0.0) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=offset_seconds)).isoformat()
+
+
+def _as_text(value) -> str:
+    """A stored value as PostgREST compares it in filters."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _unquote(value: str) -> str:
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+def _matches(row: Dict, column: str, expression: str) -> bool:
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    operator, _, argument = expression.partition(".")
+    value = row.get(column)
+    if operator == "eq":
+        result = _as_text(value) == _unquote(argument)
+    elif operator == "neq":
+        result = _as_text(value) != _unquote(argument)
+    elif operator in ("gt", "gte", "lt", "lte"):
+        if value is None:
+            result = False
+        else:
+            left, right = _as_text(value), _unquote(argument)
+            result = {"gt": left > right, "gte": left >= right, "lt": left < right, "lte": left <= right}[operator]
+    elif operator == "in":
+        options = {_unquote(option) for option in argument.strip("()").split(",")} if argument.strip("()") else set()
+        result = _as_text(value) in options
+    elif operator == "is":
+        result = _as_text(value) == argument
+    else:
+        raise ValueError(f"Unsupported filter operator: {operator}")
+    return not result if negate else result
+
+
+class PostgRESTStub(StubServer):
+    """In-memory tables behind the subset of the PostgREST API the backend uses."""
+
+    name = "supabase"
+    RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+    def __init__(self, faults: Optional[FaultProfile] = None):
+        super().__init__(faults)
+        self.tables: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    def seed(self, table: str, rows: List[Dict]) -> List[Dict]:
+        """Inserts rows directly, bypassing faults and counters, and returns them with ids."""
+        with self._lock:
+            return [self._insert_row(table, row) for row in rows]
+
+    def clear(self, table: str):
+        with self._lock:
+            self.tables[table] = []
+
+    def _insert_row(self, table: str, values: Dict) -> Dict:
+        # Microsecond offsets keep created_at unique and increasing, as keyset pagination needs
+        self._sequence += 1
+        row = {"id": str(uuid.uuid4()), "created_at": _now_iso(self._sequence / 1e6)}
+        row.update(values)
+        self.tables.setdefault(table, []).append(row)
+        return row
+
+    def describe(self, method: str, path: str) -> str:
+        resource = urlsplit(path).path.rsplit("/rest/v1/", 1)[-1]
+        if resource.startswith("rpc/"):
+            return f"rpc {resource[4:]}"
+        operation = {"GET": "select", "HEAD": "count", "POST": "insert", "PATCH": "update", "DELETE": "delete"}.get(method, method)
+        return f"{resource} {operation}"
+
+    def error_body(self, message: str) -> bytes:
+        return json.dumps({"message": message, "code": "STUB", "hint": None, "details": None}).encode()
+
+    def respond(self, method, path, headers, body):
+        parts = urlsplit(path)
+        resource = parts.path.rsplit("/rest/v1/", 1)[-1]
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        prefer = headers.get("prefer") or ""
+        payload = json.loads(body) if body else None
+
+        if resource.startswith("rpc/"):
+            return self._rpc(resource[4:], payload or {})
+
+        filters = [(column, expression) for column, expression in params if column not in self.RESERVED_PARAMS]
+        options = dict(param for param in params if param[0] in self.RESERVED_PARAMS)
+        with self._lock:
+            rows = self.tables.setdefault(resource, [])
+            if method == "POST":
+                result = self._insert(rows, resource, payload, options.get("on_conflict"), prefer)
+                status = 201
+            else:
+                matched = [row for row in rows if all(_matches(row, column, expression) for column, expression in filters)]
+                if method == "PATCH":
+                    values = {key: (_now_iso() if value == "now()" else value) for key, value in payload.items()}
+                    for row in matched:
+                        row.update(values)
+                    result = matched
+                elif method == "DELETE":
+                    for row in matched:
+                        rows.remove(row)
+                    result = matched
+                else:
+                    result = self._select(matched, options)
+                status = 200
+            result = [self._project(row, options.get("select")) for row in result]
+
+        response_headers = {"content-type": "application/json"}
+        if "count=" in prefer:
+            response_headers["content-range"] = f"0-{max(len(result) - 1, 0)}/{len(result)}" if result else f"*/{len(result)}"
+        if method != "GET" and "return=representation" not in prefer:
+            return status, response_headers, b""
+        return status, response_headers, json.dumps(result).encode()
+
+    def _insert(self, rows: List[Dict], table: str, payload, on_conflict: Optional[str], prefer: str) -> List[Dict]:
+        created = []
+        keys = (on_conflict or "id").split(",")
+        for values in payload if isinstance(payload, list) else [payload]:
+            if "resolution=" in prefer:
+                # As in a Postgres unique index, NULLs never conflict
+                existing = next((
+                    row for row in rows
+                    if all(values.get(key) is not None and row.get(key) == values.get(key) for key in keys)
+                ), None)
+                if existing is not None:
+                    if "resolution=merge-duplicates" in prefer:
+                        existing.update(values)
+                        created.append(existing)
+                    continue
+            created.append(self._insert_row(table, values))
+        return created
+
+    def _select(self, rows: List[Dict], options: Dict) -> List[Dict]:
+        result = list(rows)
+        for clause in reversed((options.get("order") or "").split(",")):
+            if not clause:
+                continue
+            column, _, direction = clause.partition(".")
+            result.sort(key=lambda row: _as_text(row.get(column)), reverse=direction.startswith("desc"))
+        offset = int(options.get("offset") or 0)
+        limit = options.get("limit")
+        return result[offset:offset + int(limit)] if limit else result[offset:]
+
+    def _project(self, row: Dict, select: Optional[str]) -> Dict:
+        if not select or select.strip() == "*":
+            return dict(row)
+        columns = [column.strip() for column in select.split(",") if column.strip()]
+        return {column: row.get(column) for column in columns}
+
+    def _rpc(self, function: str, params: Dict):
+        if function == "claim_email_notifications":
+            return self._claim_email_notifications(params)
+        if function == "latest_meetings":
+            return self._latest_meetings(params)
+        return 404, {"content-type": "application/json"}, self.error_body(f"Unknown function {function}")
+
+    def _latest_meetings(self, params: Dict):
+        emails = set(params.get("p_user_emails") or [])
+        latest: Dict[str, Dict] = {}
+        with self._lock:
+            for row in self.tables.setdefault("meetings", []):
+                email = row.get("user_email")
+                if email in emails and (email not in latest or (row.get("created_at") or "", row["id"]) > (latest[email].get("created_at") or "", latest[email]["id"])):
+                    latest[email] = row
+            result = [dict(row) for row in latest.values()]
+        return 200, {"content-type": "application/json"}, json.dumps(result).encode()
+
+    def _claim_email_notifications(self, params: Dict):
+        now = _now_iso()
+        with self._lock:
+            candidates = [
+                row for row in self.tables.setdefault("email_notifications", [])
+                if (row.get("status") == "pending" and (row.get("next_attempt_at") or "") <= now)
+                or (row.get("status") == "sending" and (row.get("lease_expires_at") or "") < now)
+            ]
+            if params.get("p_after_created_at"):
+                after = (params["p_after_created_at"], params["p_after_id"])
+                candidates = [row for row in candidates if (row["created_at"], row["id"]) > after]
+            candidates.sort(key=lambda row: (row["created_at"], row["id"]))
+            claimed = candidates[:params.get("p_limit", 50)]
+            lease_expires_at = _now_iso(params.get("p_lease_seconds", 300))
+            for row in claimed:
+                row.update(status="sending", lease_owner=params.get("p_owner"), lease_expires_at=lease_expires_at,
+                           attempt_count=(row.get("attempt_count") or 0) + 1)
+            result = [
+                {column: row.get(column) for column in ("id", "created_at", "user_email", "from_email", "subject", "html_content", "attempt_count")}
+                for row in claimed
+            ]
+        return 200, {"content-type": "application/json"}, json.dumps(result).encode()
+
+
+class ChatCompletionsStub(StubServer):
+    """OpenAI-compatible chat completions returning canned content of the requested shape."""
+
+    name = "openai"
+
+    def describe(self, method: str, path: str) -> str:
+        return f"{method} {urlsplit(path).path}"
+
+    def respond(self, method, path, headers, body):
+        request = json.loads(body)
+        response_format = (request.get("response_format") or {}).get("type")
+        if response_format == "json_schema":
+            content = json.dumps({
+                "greeting": "Hi there,",
+                "summary": "The team reviewed progress and agreed on the next milestones.",
+                "discussion_points": ["Release timeline", "Open bugs", "Customer feedback"],
+                "action_items": [{"task": "Prepare the release notes", "due": "Friday"}],
+                "next_steps": ["Share the updated plan", "Schedule the follow-up"]
+            })
+        elif response_format == "json_object":
+            content = json.dumps({
+                "summary": "The team reviewed progress and agreed on the next milestones.",
+                "decisions": ["Ship the release next week"],
+                "topics": ["Release timeline", "Open bugs"],
+                "action_items": {"Team": [{"task": "Prepare the release notes", "due": "Friday"}]},
+                "next_steps": ["Share the updated plan"]
+            })
+        else:
+            content = "Notes: the team reviewed progress, decided to ship next week and assigned the release notes."
+        prompt_tokens = sum(len(message.get("content") or "") for message in request.get("messages", [])) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        response = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        }
+        return 200, {"content-type": "application/json"}, json.dumps(response).encode()
+
+
+class WebhookSink(StubServer):
+    """Accepts delivery webhooks and counts the emails received."""
+
+    name = "webhook"
+
+    def __init__(self, faults: Optional[FaultProfile] = None):
+        super().__init__(faults)
+        self.delivered = 0
+        self._delivered_lock = threading.Lock()
+
+    def describe(self, method: str, path: str) -> str:
+        return f"{method} webhook"
+
+    def respond(self, method, path, headers, body):
+        payload = json.loads(body) if body else {}
+        if isinstance(payload, list):
+            # Batch mode: acknowledge every item by id
+            with self._delivered_lock:
+                self.delivered += len(payload)
+            results = [{"id": item.get("id"), "status": "sent"} for item in payload]
+            return 200, {"content-type": "application/json"}, json.dumps(results).encode()
+        with self._delivered_lock:
+            self.delivered += 1
+        return 200, {"content-type": "text/plain"}, b"Accepted"
@@ -0,0 +1,538 @@
+"""
+Async OpenAI access for the Veritas AI backend.
+
+Every chat completion goes through `create_chat_completion`, which answers
+repeated requests from the LLM cache, shares one AsyncOpenAI client, bounds the
+number of in-flight requests, paces calls against requests-per-minute and
+tokens-per-minute budgets, and backs off on 429s and transient provider errors.
+Prompt sizes are counted before each call and token usage is recorded per stage.
+
+`create_routed_chat_completion` adds model routing on top: it picks a model tier
+from recent per-model latency and error statistics, sends a hedged duplicate
+when the first request is slow, and enforces a deadline.
+
+The OpenAI SDK is imported on first use, not at import time, to keep
+serverless cold starts short.
+"""
+import os
+import math
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, List, Dict, Optional, Tuple
+
+import metrics
+import profiling
+from llm_cache import llm_cache, make_cache_key
+from settings import env_int, env_float
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Completions in flight at once; sized so a 50-recipient report's emails go out in one wave,
+# while the RPM/TPM buckets below keep the actual request and token rates within the account's limits
+OPENAI_CONCURRENCY = env_int("OPENAI_CONCURRENCY", 64, minimum=1)
+OPENAI_RPM_LIMIT = env_int("OPENAI_RPM_LIMIT", 500, minimum=1)
+OPENAI_TPM_LIMIT = env_int("OPENAI_TPM_LIMIT", 200000, minimum=1)
+OPENAI_MAX_RETRIES = env_int("OPENAI_MAX_RETRIES", 5, minimum=0)
+OPENAI_TIMEOUT = env_float("OPENAI_TIMEOUT", 60, minimum=0)
+
+# Context window per model, used to reject oversized prompts before paying for them
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1-mini": 1047576,
+    "gpt-4.1": 1047576,
+}
+DEFAULT_CONTEXT_TOKENS = 128000
+
+# Routing: tiers in order of preference (cheapest first); a tier is used while its recent p95 latency
+# fits LLM_LATENCY_BUDGET_SECONDS and its error rate stays under LLM_ROUTE_MAX_ERROR_RATE
+LLM_MODEL_TIERS = [model.strip() for model in os.environ.get("LLM_MODEL_TIERS", "gpt-4o-mini,gpt-4.1-mini").split(",") if model.strip()]
+LLM_LATENCY_BUDGET_SECONDS = env_float("LLM_LATENCY_BUDGET_SECONDS", 20, minimum=0)
+LLM_ROUTE_MAX_ERROR_RATE = env_float("LLM_ROUTE_MAX_ERROR_RATE", 0.2, minimum=0)
+# Statistics cover the last LLM_ROUTE_WINDOW_SECONDS; a tier with fewer samples than LLM_ROUTE_MIN_SAMPLES is assumed healthy
+LLM_ROUTE_WINDOW_SECONDS = env_float("LLM_ROUTE_WINDOW_SECONDS", 300, minimum=1)
+LLM_ROUTE_MIN_SAMPLES = env_int("LLM_ROUTE_MIN_SAMPLES", 20, minimum=0)
+# Prompts above this size are tracked apart from small ones, as they are slower on every model
+LLM_ROUTE_LARGE_PROMPT_TOKENS = env_int("LLM_ROUTE_LARGE_PROMPT_TOKENS", 16000, minimum=0)
+# Hedging: a duplicate is sent when the first request hasn't answered after the hedge delay,
+# a fixed LLM_HEDGE_DELAY_SECONDS or, if unset, the model's recent LLM_HEDGE_PERCENTILE latency
+LLM_HEDGING = os.environ.get("LLM_HEDGING", "1").lower() in ("1", "true", "yes")
+LLM_HEDGE_DELAY_SECONDS = env_float("LLM_HEDGE_DELAY_SECONDS", None, minimum=0)
+LLM_HEDGE_PERCENTILE = env_float("LLM_HEDGE_PERCENTILE", 95, minimum=0)
+LLM_HEDGE_MIN_DELAY_SECONDS = env_float("LLM_HEDGE_MIN_DELAY_SECONDS", 0.5, minimum=0)
+# Hard limit on a routed call, hedge included
+LLM_DEADLINE_SECONDS = env_float("LLM_DEADLINE_SECONDS", 60, minimum=0)
+
+
+class TokenBucket:
+    """A bucket holding up to `per_minute` units that refills continuously."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds to wait until `amount` units are available (0 if they already are)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Paces calls against both a requests-per-minute and a tokens-per-minute budget."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+
+    def has_room(self, tokens: int) -> bool:
+        """Whether one request and `tokens` tokens fit the budget right now, without reserving them."""
+        return (
+            self.paused_until <= time.monotonic()
+            and self.requests.delay_for(1) == 0
+            and self.tokens.delay_for(tokens) == 0
+        )
+
+    def pause(self, seconds: float):
+        """Holds every caller back for `seconds`, e.g. after the provider returned a 429."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens: int):
+        """Waits until one request and `tokens` tokens fit in the budget, then reserves them."""
+        while True:
+            wait = max(
+                self.paused_until - time.monotonic(),
+                self.requests.delay_for(1),
+                self.tokens.delay_for(tokens)
+            )
+            if wait <= 0:
+                # No await between the check and the reservation, so this is atomic on the loop
+                self.requests.consume(1)
+                self.tokens.consume(tokens)
+                return
+            await asyncio.sleep(wait)
+
+
+rate_limiter = RateLimiter(OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT)
+
+# Created on first use inside the running event loop
+_client = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_openai_client():
+    """Returns the shared AsyncOpenAI client, creating it on first use."""
+    global _client, _semaphore
+    if _client is None:
+        import openai
+        # Retries are handled here so they share the rate limiter's view of 429s
+        _client = openai.AsyncOpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            max_retries=0,
+            timeout=OPENAI_TIMEOUT
+        )
+        _semaphore = asyncio.Semaphore(OPENAI_CONCURRENCY)
+    return _client
+
+
+async def close_openai_client():
+    """Closes the shared AsyncOpenAI client, if one was created."""
+    global _client, _semaphore
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _semaphore = None
+
+
+# --- Token Counting ---
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Loads the tiktoken encoding once; None if tiktoken or its BPE file is unavailable."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken unavailable, estimating token counts from length: {e}")
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Counts the tokens in `text`, estimating ~4 characters per token without tiktoken."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[Dict]) -> int:
+    """Counts the prompt tokens of a chat request, including per-message overhead."""
+    return sum(count_tokens(message.get("content") or "") + 4 for message in messages) + 3
+
+
+# --- Usage Accounting ---
+_usage_lock = threading.Lock()
+token_usage: Dict[str, Dict[str, int]] = {}
+
+
+def record_usage(stage: str, model: str, usage):
+    """Adds a completion's token usage to the per-stage totals."""
+    if usage is None:
+        return
+    with _usage_lock:
+        totals = token_usage.setdefault(stage, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0})
+        totals["calls"] += 1
+        totals["prompt_tokens"] += usage.prompt_tokens or 0
+        totals["completion_tokens"] += usage.completion_tokens or 0
+        totals["total_tokens"] += usage.total_tokens or 0
+    metrics.LLM_TOKENS.inc(usage.prompt_tokens or 0, stage=stage, model=model, kind="prompt")
+    metrics.LLM_TOKENS.inc(usage.completion_tokens or 0, stage=stage, model=model, kind="completion")
+    logger.info(f"Token usage [{stage}] {model}: prompt={usage.prompt_tokens} completion={usage.completion_tokens}")
+
+
+def usage_stats() -> Dict[str, Dict[str, int]]:
+    """Snapshot of token usage per stage since startup."""
+    with _usage_lock:
+        return {stage: dict(totals) for stage, totals in token_usage.items()}
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Delay before the next attempt: the provider's Retry-After if given, else exponential backoff with jitter."""
+    response = getattr(error, "response", None)
+    headers = response.headers if response is not None else {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+async def create_chat_completion(messages: List[Dict], model: str = "gpt-4o-mini", temperature: float = 0.7,
+                                 max_tokens: int = 4000, cache: bool = True, stage: str = "completion",
+                                 validate: Optional[Callable[[str], Any]] = None, **params):
+    """
+    Creates a chat completion through the shared client, rate limiter and concurrency limit.
+
+    Identical requests are served from the LLM cache unless `cache` is False. Only responses
+    that finished with "stop" are cached; `validate`, if given, is called with the message
+    content and must not raise for the response to be cached. A cached response it rejects
+    is evicted and requested again.
+    Raises ValueError without calling the provider if the prompt doesn't fit the model's context.
+    Retries rate-limit, timeout, connection and 5xx errors up to OPENAI_MAX_RETRIES times.
+    Token usage of provider calls is recorded under `stage`.
+    """
+    prompt_tokens = count_message_tokens(messages)
+    context_tokens = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+    if prompt_tokens + max_tokens > context_tokens:
+        raise ValueError(f"Prompt of {prompt_tokens} tokens plus {max_tokens} output tokens exceeds {model}'s {context_tokens}-token context")
+
+    cache_key = None
+    if cache and llm_cache.enabled:
+        cache_key = make_cache_key(model, messages, dict(params, temperature=temperature, max_tokens=max_tokens))
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            from openai.types.chat import ChatCompletion
+            response = ChatCompletion.model_validate_json(cached)
+            if _is_cacheable(response, validate):
+                logger.info(f"LLM cache hit for {model}")
+                return response
+            logger.warning(f"Evicting cached {model} completion that failed validation")
+            llm_cache.delete(cache_key)
+
+    with profiling.stage("llm", stage):
+        response = await _create_chat_completion(messages, model, temperature, max_tokens, prompt_tokens, stage, **params)
+    record_usage(stage, model, response.usage)
+    if cache_key is not None and _is_cacheable(response, validate):
+        llm_cache.set(cache_key, response.model_dump_json())
+    return response
+
+
+def _is_cacheable(response, validate: Optional[Callable[[str], Any]]) -> bool:
+    """Whether a completion is complete and, if the caller gave a validator, parses."""
+    if not response.choices or any(choice.finish_reason != "stop" for choice in response.choices):
+        return False
+    if validate is not None:
+        try:
+            validate(response.choices[0].message.content)
+        except Exception:
+            return False
+    return True
+
+
+async def _create_chat_completion(messages: List[Dict], model: str, temperature: float, max_tokens: int,
+                                  prompt_tokens: int, stage: str, **params):
+    """Calls the provider, retrying retryable errors under the shared rate limiter."""
+    import openai
+    
+    client = get_openai_client()
+    tokens = prompt_tokens + max_tokens
+
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        await rate_limiter.acquire(tokens)
+        try:
+            async with _semaphore:
+                with metrics.track("openai", model), model_router.observe(stage, model, prompt_tokens):
+                    return await client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        **params
+                    )
+        except (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+            if attempt >= OPENAI_MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            if isinstance(e, openai.RateLimitError):
+                # Everyone sharing the budget should back off, not just this caller
+                rate_limiter.pause(delay)
+            logger.warning(f"OpenAI call failed ({type(e).__name__}), retrying in {delay:.1f}s (attempt {attempt + 1}/{OPENAI_MAX_RETRIES})")
+            await asyncio.sleep(delay)
+
+
+# --- Model Routing ---
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list; infinite when it's empty."""
+    if not sorted_values:
+        return float("inf")
+    rank = max(1, math.ceil(len(sorted_values) * pct / 100))
+    return sorted_values[min(len(sorted_values), rank) - 1]
+
+
+class LatencyWindow:
+    """Latencies and outcomes of recent calls, forgotten after `window_seconds`."""
+
+    def __init__(self, window_seconds: float, max_samples: int = 1000):
+        self.window_seconds = window_seconds
+        self.samples: Deque[Tuple[float, float, bool]] = deque(maxlen=max_samples)
+
+    def add(self, seconds: float, ok: bool):
+        self.samples.append((time.monotonic(), seconds, ok))
+
+    def _prune(self):
+        horizon = time.monotonic() - self.window_seconds
+        while self.samples and self.samples[0][0] < horizon:
+            self.samples.popleft()
+
+    def summary(self, pct: float = 95) -> Dict[str, float]:
+        """Sample count, error rate and the p50/`pct` latency of successful calls."""
+        self._prune()
+        latencies = sorted(seconds for _, seconds, ok in self.samples if ok)
+        count = len(self.samples)
+        return {
+            "count": count,
+            "error_rate": (count - len(latencies)) / count if count else 0.0,
+            "p50": _percentile(latencies, 50),
+            "tail": _percentile(latencies, pct)
+        }
+
+
+class ModelRouter:
+    """
+    Chooses the model tier for routed completions from recent latency and error statistics.
+
+    Every provider call is recorded per stage, model and prompt size class, so a
+    model that is fast for short personalization prompts but slow for whole
+    transcripts is judged separately for each. Routing prefers the cheapest tier
+    that fits the prompt and meets the latency budget; tiers without enough recent
+    samples count as healthy, so traffic returns to a cheaper tier once its bad
+    samples have aged out of the window.
+    """
+
+    def __init__(self, tiers: List[str], budget: float, max_error_rate: float, window_seconds: float,
+                 min_samples: int, large_prompt_tokens: int):
+        self.tiers = tiers
+        self.budget = budget
+        self.max_error_rate = max_error_rate
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.large_prompt_tokens = large_prompt_tokens
+        self._windows: Dict[Tuple[str, str, str], LatencyWindow] = {}
+        self._lock = threading.Lock()
+
+    def size_class(self, prompt_tokens: int) -> str:
+        return "large" if prompt_tokens > self.large_prompt_tokens else "small"
+
+    def record(self, stage: str, model: str, prompt_tokens: int, seconds: float, ok: bool):
+        key = (stage, model, self.size_class(prompt_tokens))
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = LatencyWindow(self.window_seconds)
+            window.add(seconds, ok)
+
+    @contextmanager
+    def observe(self, stage: str, model: str, prompt_tokens: int):
+        """
+        Records the enclosed provider call's latency and whether it failed.
+
+        Cancelled calls (e.g. a hedge's loser) are not recorded: they have no outcome,
+        and their time so far is not a latency.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record(stage, model, prompt_tokens, time.perf_counter() - started, False)
+            raise
+        self.record(stage, model, prompt_tokens, time.perf_counter() - started, True)
+
+    def stats(self, stage: str, model: str, prompt_tokens: int, pct: float = 95) -> Dict[str, float]:
+        with self._lock:
+            window = self._windows.get((stage, model, self.size_class(prompt_tokens)))
+            if window is None:
+                return {"count": 0, "error_rate": 0.0, "p50": float("inf"), "tail": float("inf")}
+            return window.summary(pct)
+
+    def _fitting_tiers(self, prompt_tokens: int, max_tokens: int) -> List[str]:
+        return [
+            model for model in self.tiers
+            if prompt_tokens + max_tokens <= MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+        ]
+
+    def choose(self, stage: str, prompt_tokens: int, max_tokens: int, budget: Optional[float] = None) -> str:
+        """The first tier that fits the prompt and is meeting `budget`, else the one coming closest."""
+        budget = budget or self.budget
+        candidates = self._fitting_tiers(prompt_tokens, max_tokens)
+        if not candidates:
+            # Nothing fits; the largest context gives the clearest error
+            return max(self.tiers, key=lambda model: MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS))
+
+        fallbacks = []
+        for model in candidates:
+            stats = self.stats(stage, model, prompt_tokens)
+            if stats["count"] < self.min_samples:
+                return model
+            failing = stats["error_rate"] > self.max_error_rate
+            if not failing and stats["tail"] <= budget:
+                return model
+            fallbacks.append((failing, stats["tail"], model))
+        model = min(fallbacks)[2]
+        logger.info(f"No model meets the {budget:.0f}s latency budget for {stage} ({self.size_class(prompt_tokens)} prompt); routing to {model}")
+        return model
+
+    def hedge_model(self, stage: str, primary: str, prompt_tokens: int, max_tokens: int) -> str:
+        """The model for a hedged duplicate: the primary, unless another healthy tier is currently faster."""
+        best, best_p50 = primary, self.stats(stage, primary, prompt_tokens)["p50"]
+        for model in self._fitting_tiers(prompt_tokens, max_tokens):
+            stats = self.stats(stage, model, prompt_tokens)
+            if stats["count"] >= self.min_samples and stats["error_rate"] <= self.max_error_rate and stats["p50"] < best_p50:
+                best, best_p50 = model, stats["p50"]
+        return best
+
+    def hedge_delay(self, stage: str, model: str, prompt_tokens: int) -> float:
+        """How long the first request may run before a hedge is sent."""
+        if LLM_HEDGE_DELAY_SECONDS is not None:
+            return LLM_HEDGE_DELAY_SECONDS
+        stats = self.stats(stage, model, prompt_tokens, LLM_HEDGE_PERCENTILE)
+        if stats["count"] < self.min_samples or stats["tail"] == float("inf"):
+            return self.budget / 2
+        return max(LLM_HEDGE_MIN_DELAY_SECONDS, stats["tail"])
+
+
+model_router = ModelRouter(
+    LLM_MODEL_TIERS, LLM_LATENCY_BUDGET_SECONDS, LLM_ROUTE_MAX_ERROR_RATE, LLM_ROUTE_WINDOW_SECONDS,
+    LLM_ROUTE_MIN_SAMPLES, LLM_ROUTE_LARGE_PROMPT_TOKENS
+)
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """Whether a failed completion might succeed if sent again (the errors `_create_chat_completion` retries)."""
+    import openai
+    return isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError))
+
+
+def _has_capacity(tokens: int) -> bool:
+    """Whether a request could start now without waiting for the rate budget or a concurrency slot."""
+    return rate_limiter.has_room(tokens) and not (_semaphore is not None and _semaphore.locked())
+
+
+async def create_routed_chat_completion(messages: List[Dict], max_tokens: int = 4000, stage: str = "completion",
+                                        budget: Optional[float] = None, deadline: Optional[float] = None, **params):
+    """
+    Creates a chat completion on the model tier the router picks for this stage and prompt.
+
+    If the request hasn't answered within the hedge delay, or fails before it with an
+    error worth retrying (not e.g. a 400 or an oversized prompt), a duplicate is sent (to the same model unless another tier is currently faster);
+    the first answer wins and the other request is cancelled. Hedges are only sent
+    while the rate budget and concurrency limit have room, so they never hold up
+    first attempts. Raises asyncio.TimeoutError after `deadline` (LLM_DEADLINE_SECONDS).
+    Other arguments are passed to `create_chat_completion`.
+    """
+    prompt_tokens = count_message_tokens(messages)
+    model = model_router.choose(stage, prompt_tokens, max_tokens, budget)
+    metrics.LLM_ROUTES.inc(stage=stage, model=model)
+    return await asyncio.wait_for(
+        _hedged_chat_completion(messages, model, max_tokens, stage, prompt_tokens, params),
+        deadline or LLM_DEADLINE_SECONDS
+    )
+
+
+async def _hedged_chat_completion(messages: List[Dict], model: str, max_tokens: int, stage: str, prompt_tokens: int, params: Dict):
+    def send(target: str) -> asyncio.Future:
+        return asyncio.ensure_future(create_chat_completion(messages, model=target, max_tokens=max_tokens, stage=stage, **params))
+
+    primary = send(model)
+    tasks = [primary]
+    try:
+        if not LLM_HEDGING:
+            return await primary
+        await asyncio.wait([primary], timeout=model_router.hedge_delay(stage, model, prompt_tokens))
+        if primary.done() and (primary.exception() is None or not _is_retryable(primary.exception())):
+            return primary.result()
+        if not _has_capacity(prompt_tokens + max_tokens):
+            return await primary
+
+        hedge_model = model_router.hedge_model(stage, model, prompt_tokens, max_tokens)
+        logger.info(f"Hedging {stage} completion on {hedge_model} ({model} {'failed' if primary.done() else 'is slow'})")
+        hedge = send(hedge_model)
+        tasks.append(hedge)
+        error = primary.exception() if primary.done() else None
+        pending = {task for task in tasks if not task.done()}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    metrics.LLM_HEDGES.inc(stage=stage, model=hedge_model, winner="primary" if task is primary else "hedge")
+                    return task.result()
+                error = task.exception()
+        metrics.LLM_HEDGES.inc(stage=stage, model=hedge_model, winner="none")
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            # Collect the loser's outcome so asyncio doesn't log it as never retrieved
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
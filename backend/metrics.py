@@ -0,0 +1,250 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Outbound calls are measured with `track` (a context manager) or `timed` (a
+decorator for sync and async functions), which count every call and record its
+latency in a histogram labelled by dependency, operation and outcome. The
+shared helpers for Supabase queries, OpenAI completions and webhook deliveries
+are wrapped with them, so new call sites going through those helpers are
+measured without extra code. `render` produces the `/metrics` payload.
+
+Metrics live in the process: each worker or serverless instance exposes its own.
+"""
+import time
+import asyncio
+import threading
+import functools
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# Seconds; spans fast PostgREST reads up to slow LLM completions and webhook timeouts
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """A named metric with a fixed set of label names; one series per label combination."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"] + self.samples()
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = dict(self._series)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in sorted(series.items())]
+
+
+class Gauge(Metric):
+    """A value that is set to its current level, e.g. at scrape time."""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = dict(self._series)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in sorted(series.items())]
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = {key: {"counts": list(value["counts"]), "sum": value["sum"], "count": value["count"]} for key, value in self._series.items()}
+        lines = []
+        for key, value in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, value["counts"]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(value['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {value['count']}")
+        return lines
+
+
+class Registry:
+    """The set of metrics exposed together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+DEPENDENCY_CALLS = registry.register(Counter(
+    "veritas_dependency_calls_total", "Outbound calls by dependency, operation and outcome.",
+    ("dependency", "operation", "outcome")
+))
+DEPENDENCY_LATENCY = registry.register(Histogram(
+    "veritas_dependency_latency_seconds", "Latency of outbound calls by dependency, operation and outcome.",
+    ("dependency", "operation", "outcome")
+))
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "veritas_http_request_duration_seconds", "Duration of API requests by route and status code.",
+    ("method", "route", "status")
+))
+LLM_TOKENS = registry.register(Counter(
+    "veritas_llm_tokens_total", "Tokens consumed by LLM completions by stage, model and kind (prompt/completion).",
+    ("stage", "model", "kind")
+))
+EMAIL_QUEUE_DEPTH = registry.register(Gauge(
+    "veritas_email_queue_depth", "Emails in email_notifications by delivery status, sampled at scrape time.",
+    ("status",)
+))
+CIRCUIT_OPEN = registry.register(Gauge(
+    "veritas_circuit_open", "1 while a dependency's circuit breaker is refusing calls, else 0.",
+    ("dependency",)
+))
+LLM_ROUTES = registry.register(Counter(
+    "veritas_llm_routes_total", "Routed LLM calls by stage and the model the router chose.",
+    ("stage", "model")
+))
+LLM_HEDGES = registry.register(Counter(
+    "veritas_llm_hedges_total", "Hedged duplicate LLM requests by stage, model and which request answered first (primary/hedge/none).",
+    ("stage", "model", "winner")
+))
+
+
+class CallTimer:
+    """Handle yielded by `track`; set `outcome` to label the call with its result."""
+
+    __slots__ = ("outcome",)
+
+    def __init__(self):
+        self.outcome = "ok"
+
+
+@contextmanager
+def track(dependency: str, operation: str):
+    """
+    Counts and times the enclosed outbound call.
+
+    An exception sets the outcome to "error", and cancellation (e.g. of the losing
+    request of a hedged call) to "cancelled".
+    """
+    timer = CallTimer()
+    started = time.perf_counter()
+    try:
+        yield timer
+    except asyncio.CancelledError:
+        timer.outcome = "cancelled"
+        raise
+    except BaseException:
+        timer.outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        DEPENDENCY_CALLS.inc(dependency=dependency, operation=operation, outcome=timer.outcome)
+        DEPENDENCY_LATENCY.observe(elapsed, dependency=dependency, operation=operation, outcome=timer.outcome)
+
+
+def timed(dependency: str, operation: Union[str, Callable[..., str]], outcome: Optional[Callable[[object], str]] = None):
+    """
+    Decorates a sync or async function so every call is recorded with `track`.
+
+    `operation` is a label or a function of the call's arguments returning one;
+    `outcome`, if given, derives the outcome label from the return value.
+    """
+    def decorator(func):
+        def labels(args, kwargs) -> str:
+            return operation(*args, **kwargs) if callable(operation) else operation
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with track(dependency, labels(args, kwargs)) as timer:
+                    result = await func(*args, **kwargs)
+                    if outcome is not None:
+                        timer.outcome = outcome(result)
+                    return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track(dependency, labels(args, kwargs)) as timer:
+                result = func(*args, **kwargs)
+                if outcome is not None:
+                    timer.outcome = outcome(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def render() -> str:
+    """The current value of every metric in Prometheus text format."""
+    return registry.render()
@@ -0,0 +1,174 @@
+"""
+Opt-in per-request stage profiling.
+
+A request that asks for it (the `X-Profile: 1` header or `?profile=1`) gets a
+`Profile` bound to its context. Functions decorated with `profiled` and blocks
+wrapped in `stage` then record their wall-clock and CPU time, including inside
+tasks spawned by `asyncio.gather` and threads started by `asyncio.to_thread`,
+which inherit the request's context. Without an active profile a stage costs one
+context variable lookup, so the decorators stay in place in production.
+
+CPU time is process CPU time elapsed during the stage; stages that run
+concurrently overlap, so their CPU times are not additive.
+
+A profile is summarised per stage for the response and can be exported in the
+Chrome trace event format, which chrome://tracing and ui.perfetto.dev display
+as a timeline.
+"""
+import os
+import json
+import time
+import asyncio
+import functools
+import threading
+from contextvars import ContextVar
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Directory for trace files of profiled requests; unset means traces are only returned inline
+PROFILE_TRACE_DIR = os.environ.get("PROFILE_TRACE_DIR")
+
+_current_profile: ContextVar[Optional["Profile"]] = ContextVar("current_profile", default=None)
+
+
+class Profile:
+    """Stage timings collected for one request."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_wall = time.perf_counter()
+        self.started_cpu = time.process_time()
+        self.events: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, detail: Optional[str], started_wall: float, wall: float, cpu: float):
+        lane = _lane()
+        with self._lock:
+            self.events.append({
+                "stage": stage,
+                "detail": detail,
+                "start": started_wall - self.started_wall,
+                "wall": wall,
+                "cpu": cpu,
+                "lane": lane
+            })
+
+    def summary(self) -> Dict:
+        """Totals per stage plus every recorded span, in milliseconds."""
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event["start"])
+        stages: Dict[str, Dict] = {}
+        for event in events:
+            totals = stages.setdefault(event["stage"], {"calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0, "max_wall_ms": 0.0})
+            totals["calls"] += 1
+            totals["wall_ms"] += event["wall"] * 1000
+            totals["cpu_ms"] += event["cpu"] * 1000
+            totals["max_wall_ms"] = max(totals["max_wall_ms"], event["wall"] * 1000)
+        return {
+            "name": self.name,
+            "total_wall_ms": round((time.perf_counter() - self.started_wall) * 1000, 3),
+            "total_cpu_ms": round((time.process_time() - self.started_cpu) * 1000, 3),
+            "stages": {name: {key: round(value, 3) for key, value in totals.items()} for name, totals in stages.items()},
+            "spans": [
+                {
+                    "stage": event["stage"],
+                    "detail": event["detail"],
+                    "start_ms": round(event["start"] * 1000, 3),
+                    "wall_ms": round(event["wall"] * 1000, 3),
+                    "cpu_ms": round(event["cpu"] * 1000, 3)
+                }
+                for event in events
+            ]
+        }
+
+    def chrome_trace(self) -> Dict:
+        """The spans as Chrome trace "complete" events, one timeline lane per task or thread."""
+        with self._lock:
+            events = list(self.events)
+        lanes: Dict[str, int] = {}
+        trace_events = []
+        for event in sorted(events, key=lambda event: event["start"]):
+            trace_events.append({
+                "name": event["stage"] if not event["detail"] else f"{event['stage']}: {event['detail']}",
+                "cat": event["stage"],
+                "ph": "X",
+                "ts": round(event["start"] * 1e6, 1),
+                "dur": round(event["wall"] * 1e6, 1),
+                "pid": 1,
+                "tid": lanes.setdefault(event["lane"], len(lanes) + 1),
+                "args": {"cpu_ms": round(event["cpu"] * 1000, 3)}
+            })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms", "otherData": {"name": self.name}}
+
+    def write_trace(self, directory: str) -> str:
+        """Writes the Chrome trace to a new file in `directory` and returns its path."""
+        os.makedirs(directory, exist_ok=True)
+        safe_name = "".join(c if c.isalnum() else "_" for c in self.name).strip("_") or "request"
+        path = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}_{safe_name}_{id(self):x}.json")
+        with open(path, "w") as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+        return path
+
+
+def _lane() -> str:
+    """Identifies the asyncio task or thread a span ran on."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return f"task-{id(task):x}"
+    return f"thread-{threading.get_ident()}"
+
+
+def start_profile(name: str) -> Profile:
+    """Activates a new profile for the current context (the rest of the request)."""
+    profile = Profile(name)
+    _current_profile.set(profile)
+    return profile
+
+
+def current_profile() -> Optional[Profile]:
+    return _current_profile.get()
+
+
+@contextmanager
+def stage(name: str, detail: Optional[str] = None):
+    """Records the enclosed block as a stage of the active profile, if any."""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    started_wall = time.perf_counter()
+    started_cpu = time.process_time()
+    try:
+        yield
+    finally:
+        profile.record(name, detail, started_wall, time.perf_counter() - started_wall, time.process_time() - started_cpu)
+
+
+def profiled(name: str, detail: Optional[Callable[..., str]] = None):
+    """
+    Decorates a sync or async function so each call is a stage of the active profile.
+
+    `detail`, if given, is called with the function's arguments to label the span
+    (e.g. with the recipient); it is only evaluated while profiling.
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_profile.get() is None:
+                    return await func(*args, **kwargs)
+                with stage(name, detail(*args, **kwargs) if detail else None):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_profile.get() is None:
+                return func(*args, **kwargs)
+            with stage(name, detail(*args, **kwargs) if detail else None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
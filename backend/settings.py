@@ -0,0 +1,33 @@
+"""
+Numeric settings read from the environment.
+
+Every module reads its tuning knobs through `env_int` and `env_float`, so a
+malformed or out-of-range value (`OPENAI_CONCURRENCY=0`, `LLM_CACHE_TTL=1d`)
+stops the process at import time with the variable's name, instead of
+surfacing later as a hang or an unrelated error. Unset or blank variables
+take the default.
+"""
+import os
+
+
+def _env_number(name: str, default, minimum, parse, kind: str):
+    raw = os.environ.get(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        value = parse(raw)
+    except ValueError:
+        value = None
+    if value is None or value < minimum:
+        raise ValueError(f"Invalid {name}={raw!r}: expected {kind} >= {minimum}")
+    return value
+
+
+def env_int(name: str, default: int, minimum: int = 0) -> int:
+    """An integer setting from the environment; a malformed or too small value fails at startup, naming the variable."""
+    return _env_number(name, default, minimum, int, "an integer")
+
+
+def env_float(name: str, default: float, minimum: float = 0) -> float:
+    """A number setting from the environment; a malformed or too small value fails at startup, naming the variable."""
+    return _env_number(name, default, minimum, float, "a number")
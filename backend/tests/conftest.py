@@ -0,0 +1,41 @@
+"""
+The backend reads its settings when it is imported, so the benchmark stubs are started
+and the environment pointed at them before any test module is collected.
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "benchmarks"))
+
+from stubs import PostgRESTStub, ChatCompletionsStub, WebhookSink  # noqa: E402
+
+_stubs = {}
+
+
+def pytest_configure(config):
+    _stubs.update(db=PostgRESTStub().start(), llm=ChatCompletionsStub().start(), webhook=WebhookSink().start())
+    os.environ.update({
+        "SUPABASE_URL": _stubs["db"].url,
+        "SUPABASE_ANON_KEY": "test-key",
+        "OPENAI_API_KEY": "stub-key",
+        "OPENAI_BASE_URL": f"{_stubs['llm'].url}/v1",
+        "OPENAI_MAX_RETRIES": "0",
+        "MAKE_WEBHOOK_URL": f"{_stubs['webhook'].url}/webhook",
+        "LLM_CACHE_BACKEND": "none",
+    })
+
+
+def pytest_unconfigure(config):
+    for stub in _stubs.values():
+        stub.stop()
+
+
+@pytest.fixture(scope="session")
+def stubs():
+    """The PostgREST, chat completions and webhook stubs, as `(db, llm, webhook)`."""
+    return _stubs["db"], _stubs["llm"], _stubs["webhook"]
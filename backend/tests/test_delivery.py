@@ -0,0 +1,126 @@
+"""
+Email delivery helpers: the webhook circuit breaker, batch result parsing and the
+write-back outcomes that decide between sent, retry and failed.
+"""
+import time
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A fake `time.monotonic` that only moves when the test advances it."""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+
+    def advance(seconds: float):
+        now[0] += seconds
+    return advance
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = main.CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.retry_after() == 30
+
+
+def test_breaker_lets_one_trial_through_when_half_open(clock):
+    breaker = main.CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock(30)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_breaker_failed_trial_reopens_the_circuit(clock):
+    breaker = main.CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock(30)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.retry_after() == 30
+
+
+def test_breaker_released_trial_frees_the_slot(clock):
+    breaker = main.CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock(30)
+    assert breaker.allow()
+    breaker.release_trial()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_batch_results_are_aligned_with_the_records():
+    records = [{"id": 1}, {"id": 2}, {"id": 3}]
+    body = '{"results": [{"id": 3, "status": "sent"}, {"id": 1, "status": "failed", "error": "bounced", "retryable": true}]}'
+
+    results = main.parse_webhook_batch_results(body, records)
+
+    assert results[0] == {"status": "failed", "error": "bounced", "retryable": True, "retry_after": None}
+    assert results[1]["status"] == "failed" and "No result" in results[1]["error"]
+    assert results[2]["status"] == "sent"
+
+
+def test_batch_results_match_ids_as_strings():
+    results = main.parse_webhook_batch_results('[{"id": "7", "status": "sent"}]', [{"id": 7}])
+    assert results[0]["status"] == "sent"
+
+
+def test_batch_results_without_a_list_accept_the_whole_batch():
+    results = main.parse_webhook_batch_results("Accepted", [{"id": 1}, {"id": 2}])
+    assert [result["status"] for result in results] == ["sent", "sent"]
+    assert results[0]["webhook_response"] == "Accepted"
+
+
+def test_outcomes_retry_retryable_failures_until_the_last_attempt():
+    last = main.EMAIL_MAX_ATTEMPTS
+    records = [{"id": 1, "attempt_count": 1}, {"id": 2, "attempt_count": last}, {"id": 3, "attempt_count": 1}, {"id": 4, "attempt_count": 1}]
+    results = [
+        {"status": "failed", "error": "timeout", "retryable": True},
+        {"status": "failed", "error": "timeout", "retryable": True},
+        {"status": "failed", "error": "rejected"},
+        {"status": "sent"},
+    ]
+
+    outcomes = main.delivery_outcomes(records, results)
+
+    assert outcomes[0]["status"] == "retry" and outcomes[0]["next_attempt_at"]
+    assert outcomes[1]["status"] == "failed"
+    assert outcomes[2] == {"id": 3, "status": "failed", "error": "rejected"}
+    assert outcomes[3]["status"] == "sent"
+
+
+def test_outcomes_share_a_retry_time_per_attempt_and_retry_after():
+    records = [{"id": index, "attempt_count": 1} for index in range(3)]
+    results = [{"status": "failed", "retryable": True, "retry_after": 60} for _ in records]
+
+    outcomes = main.delivery_outcomes(records, results)
+
+    assert len({outcome["next_attempt_at"] for outcome in outcomes}) == 1
+
+
+def test_short_circuited_failures_do_not_spend_an_attempt():
+    records = [{"id": 1, "attempt_count": main.EMAIL_MAX_ATTEMPTS}]
+    results = [{"status": "failed", "error": "circuit open", "retryable": True, "short_circuited": True}]
+
+    outcomes = main.delivery_outcomes(records, results)
+
+    assert outcomes[0]["status"] == "retry"
+    assert outcomes[0]["attempt_count"] == main.EMAIL_MAX_ATTEMPTS - 1
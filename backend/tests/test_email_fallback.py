@@ -0,0 +1,72 @@
+"""
+Fallback template emails must not be reused as if the LLM had written them.
+
+Runs the live report against the benchmark stubs with every completion failing,
+several times, then again once the LLM recovers, and checks the outage sends each
+recipient one fallback while the recovered run still generates the real emails.
+"""
+import asyncio
+
+from stubs import PostgRESTStub
+
+
+def seed_meeting(db: PostgRESTStub) -> dict:
+    users = db.seed("users", [
+        {"email": f"user{index}@example.com", "full_name": f"User {index}", "monitoring_enabled": True}
+        for index in range(3)
+    ])
+    meeting = db.seed("meetings", [{"user_email": users[0]["email"], "meeting_title": "Release sync", "status": "completed"}])[0]
+    db.seed("meeting_participants", [
+        {"meeting_id": meeting["id"], "participant_name": user["full_name"], "participant_email": user["email"]}
+        for user in users
+    ])
+    db.seed("transcripts", [{"meeting_id": meeting["id"], "transcript_text": "User 0: Ship on Friday.\nUser 1: I'll write the notes."}])
+    return {"user_email": users[0]["email"], "meeting_id": meeting["id"]}
+
+
+def test_fallback_emails_are_sent_once_and_regenerated_after_the_llm_recovers(stubs):
+    import httpx
+    import main
+
+    db, llm, webhook = stubs
+    body = seed_meeting(db)
+    llm.faults.error_rate = 1.0
+    delivered_before = webhook.delivered
+
+    async def report() -> dict:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            response = await client.post("/generate-live-report", json=body)
+        assert response.status_code == 200
+        return response.json()
+
+    def rows() -> list:
+        return [row for row in db.tables["email_notifications"] if row["meeting_id"] == body["meeting_id"]]
+
+    async def delivered():
+        for _ in range(200):
+            if all(row["status"] != "pending" for row in rows()):
+                return
+            await asyncio.sleep(0.05)
+        raise AssertionError("emails were not delivered")
+
+    async def run():
+        async with main.lifespan(main.app):
+            failing = []
+            for _ in range(3):
+                failing.append(await report())
+                await delivered()
+            fallback_rows, fallback_posts = rows(), webhook.delivered - delivered_before
+            llm.faults.error_rate = 0.0
+            recovered = await report()
+        return failing, fallback_rows, fallback_posts, recovered
+
+    failing, fallback_rows, fallback_posts, recovered = asyncio.run(run())
+
+    assert failing[0]["successful_emails"] == 3
+    assert all(run["successful_emails"] == 0 for run in failing[1:])
+    assert len(fallback_rows) == 3
+    assert fallback_posts == 3
+    assert all(row["input_fingerprint"].startswith("fallback:") for row in fallback_rows)
+    assert recovered["successful_emails"] == 3
+    assert recovered["skipped_emails"] == 0
@@ -0,0 +1,47 @@
+"""The per-minute token buckets that pace OpenAI requests and tokens."""
+import time
+
+import pytest
+
+from llm import TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A fake `time.monotonic` that only moves when the test advances it."""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+
+    def advance(seconds: float):
+        now[0] += seconds
+    return advance
+
+
+def test_bucket_starts_full(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.delay_for(60) == 0
+
+
+def test_bucket_delay_is_the_time_to_refill_the_shortfall(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.consume(60)
+    assert bucket.delay_for(1) == pytest.approx(1.0)
+    assert bucket.delay_for(30) == pytest.approx(30.0)
+
+
+def test_bucket_refills_continuously_up_to_its_capacity(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.consume(60)
+    clock(10)
+    assert bucket.delay_for(10) == 0
+    clock(600)
+    bucket.delay_for(1)
+    assert bucket.available == 60
+
+
+def test_request_larger_than_the_capacity_waits_for_a_full_bucket(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.delay_for(1000) == 0
+    bucket.consume(1000)
+    assert bucket.available == 0
+    assert bucket.delay_for(1000) == pytest.approx(60.0)
@@ -0,0 +1,114 @@
+"""
+The in-process recipient list: one shared refresh, TTL expiry, serving a stale list
+when a refresh fails, and a fallback that is used but never cached.
+"""
+import asyncio
+
+import main
+
+
+class Loader:
+    """Counts calls and returns `users`, or raises while `failing` is set."""
+
+    def __init__(self, users, delay: float = 0):
+        self.users = users
+        self.delay = delay
+        self.failing = False
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        users, failing = list(self.users), self.failing
+        await asyncio.sleep(self.delay)
+        if failing:
+            raise RuntimeError("database unavailable")
+        return users
+
+
+def test_concurrent_callers_share_one_refresh():
+    loader = Loader([{"email": "a@example.com"}], delay=0.05)
+    cache = main.RecipientCache(loader, ttl=60, max_stale=60)
+
+    async def run():
+        return await asyncio.gather(*[cache.get() for _ in range(10)])
+
+    results = asyncio.run(run())
+
+    assert loader.calls == 1
+    assert all(users == [{"email": "a@example.com"}] for users in results)
+
+
+def test_list_is_reloaded_after_the_ttl():
+    loader = Loader([{"email": "a@example.com"}])
+    cache = main.RecipientCache(loader, ttl=0.05, max_stale=60)
+
+    async def run():
+        await cache.get()
+        await cache.get()
+        assert loader.calls == 1
+        await asyncio.sleep(0.1)
+        await cache.get()
+
+    asyncio.run(run())
+
+    assert loader.calls == 2
+    assert cache.hits == 1
+
+
+def test_failed_refresh_serves_the_stale_list_and_backs_off():
+    loader = Loader([{"email": "a@example.com"}])
+    cache = main.RecipientCache(loader, ttl=0.05, max_stale=60)
+
+    async def run():
+        await cache.get()
+        loader.failing = True
+        await asyncio.sleep(0.1)
+        first = await cache.get()
+        second = await cache.get()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == second == [{"email": "a@example.com"}]
+    assert loader.calls == 2
+    assert cache.stale_served == 2
+
+
+def test_fallback_is_returned_but_not_cached():
+    loader = Loader([{"email": "a@example.com"}])
+    loader.failing = True
+    fallback = Loader([{"email": "everyone@example.com"}])
+    cache = main.RecipientCache(loader, ttl=60, max_stale=60, fallback=fallback)
+
+    async def run():
+        during_outage = await cache.get()
+        loader.failing = False
+        after_outage = await cache.get()
+        return during_outage, after_outage
+
+    during_outage, after_outage = asyncio.run(run())
+
+    assert during_outage == [{"email": "everyone@example.com"}]
+    assert after_outage == [{"email": "a@example.com"}]
+    assert cache.fallbacks == 1
+    assert loader.calls == 2
+
+
+def test_invalidate_discards_a_refresh_in_flight():
+    loader = Loader([{"email": "old@example.com"}], delay=0.05)
+    cache = main.RecipientCache(loader, ttl=60, max_stale=60)
+
+    async def run():
+        pending = asyncio.ensure_future(cache.get())
+        while loader.calls == 0:
+            await asyncio.sleep(0)
+        cache.invalidate()
+        loader.users = [{"email": "new@example.com"}]
+        stale = await pending
+        return stale, await cache.get()
+
+    stale, fresh = asyncio.run(run())
+
+    assert stale == [{"email": "old@example.com"}]
+    assert fresh == [{"email": "new@example.com"}]
+    assert loader.calls == 2
@@ -0,0 +1,52 @@
+"""Splitting long transcripts into overlapping chunks and grouping notes for the reduce step."""
+from transcripts import chunk_transcript, count_tokens, group_notes, split_speaker_turns
+
+
+def make_transcript(turns: int, words: int = 20) -> str:
+    return "\n".join(f"Speaker {index % 3}: turn {index} " + "word " * words for index in range(turns))
+
+
+def test_turns_keep_their_continuation_lines():
+    turns = split_speaker_turns("Ana: first line\nstill Ana\n\nBen: reply")
+    assert turns == ["Ana: first line\nstill Ana", "Ben: reply"]
+
+
+def test_chunks_stay_within_the_limit():
+    chunks = chunk_transcript(make_transcript(60), max_tokens=200, overlap_tokens=50)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 200 for chunk in chunks)
+
+
+def test_each_chunk_starts_with_the_tail_of_the_previous_one():
+    chunks = chunk_transcript(make_transcript(60), max_tokens=200, overlap_tokens=50)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        first_turn = chunk.split("\n")[0]
+        assert previous.endswith(first_turn)
+
+
+def test_no_overlap_when_disabled():
+    chunks = chunk_transcript(make_transcript(60), max_tokens=200, overlap_tokens=0)
+    turns = [turn for chunk in chunks for turn in chunk.split("\n")]
+    assert turns == split_speaker_turns(make_transcript(60))
+
+
+def test_oversized_turn_is_split_on_word_boundaries():
+    transcript = "Ana: " + " ".join(f"w{index}" for index in range(2000))
+    chunks = chunk_transcript(transcript, max_tokens=100, overlap_tokens=0)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 100 for chunk in chunks)
+    assert " ".join(chunks).split(" ") == transcript.split(" ")
+
+
+def test_notes_are_grouped_within_the_budget():
+    notes = ["word " * 100] * 10
+    budget = count_tokens(notes[0]) * 3
+    groups = group_notes(notes, budget)
+    assert [note for group in groups for note in group] == notes
+    assert all(sum(count_tokens(note) for note in group) <= budget for group in groups)
+    assert len(groups) == 4
+
+
+def test_groups_take_two_notes_even_over_the_budget():
+    groups = group_notes(["word " * 100] * 5, budget=1)
+    assert [len(group) for group in groups] == [2, 2, 1]
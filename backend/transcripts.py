@@ -0,0 +1,222 @@
+"""
+Token-aware preparation of meeting transcripts for prompts.
+
+Transcripts that fit TRANSCRIPT_TOKEN_BUDGET are used as-is. Longer ones are
+split into overlapping chunks on speaker turns, the chunks are summarized in
+parallel ("map"), and the chunk notes are merged into one digest ("reduce")
+that stands in for the transcript in the final prompt. Notes that together
+exceed the budget are merged in groups, and the group digests merged again,
+until one digest is left.
+"""
+import os
+import re
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import List
+
+from llm import create_chat_completion, count_tokens
+from settings import env_int
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+TRANSCRIPT_TOKEN_BUDGET = env_int("TRANSCRIPT_TOKEN_BUDGET", 12000, minimum=1)
+TRANSCRIPT_CHUNK_TOKENS = env_int("TRANSCRIPT_CHUNK_TOKENS", 4000, minimum=1)
+TRANSCRIPT_CHUNK_OVERLAP_TOKENS = env_int("TRANSCRIPT_CHUNK_OVERLAP_TOKENS", 200, minimum=0)
+SUMMARY_MODEL = os.environ.get("SUMMARY_MODEL", "gpt-4o-mini")
+
+# A speaker turn starts with a line like "Sarah Johnson: ..."
+SPEAKER_TURN_PATTERN = re.compile(r"^\s*[^\s:][^:\n]{0,60}:\s")
+
+
+def split_speaker_turns(transcript: str) -> List[str]:
+    """Splits a transcript into speaker turns, keeping continuation lines with their turn."""
+    turns = []
+    current = []
+    for line in transcript.splitlines():
+        if not line.strip():
+            continue
+        if SPEAKER_TURN_PATTERN.match(line) and current:
+            turns.append("\n".join(current))
+            current = []
+        current.append(line.strip())
+    if current:
+        turns.append("\n".join(current))
+    return turns
+
+
+def _split_oversized_turn(turn: str, max_tokens: int) -> List[str]:
+    """Splits a single turn that is larger than a chunk into chunk-sized pieces on word boundaries."""
+    pieces = []
+    words = turn.split(" ")
+    current = []
+    current_tokens = 0
+    for word in words:
+        word_tokens = count_tokens(word + " ")
+        if current and current_tokens + word_tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+            current_tokens = 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_transcript(transcript: str, max_tokens: int = TRANSCRIPT_CHUNK_TOKENS,
+                     overlap_tokens: int = TRANSCRIPT_CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """
+    Groups speaker turns into chunks of at most `max_tokens`.
+
+    Each chunk after the first starts with the trailing turns of the previous one
+    (up to `overlap_tokens`), so context that spans a boundary isn't lost.
+    """
+    turns = []
+    for turn in split_speaker_turns(transcript):
+        if count_tokens(turn) > max_tokens:
+            turns.extend(_split_oversized_turn(turn, max_tokens))
+        else:
+            turns.append(turn)
+
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+    for turn in turns:
+        turn_tokens = count_tokens(turn)
+        if current and current_tokens + turn_tokens > max_tokens:
+            chunks.append("\n".join(current))
+
+            # Carry the tail of the finished chunk over as overlap
+            overlap: List[str] = []
+            overlap_size = 0
+            for previous in reversed(current):
+                previous_tokens = count_tokens(previous)
+                if overlap_size + previous_tokens > overlap_tokens or overlap_size + previous_tokens + turn_tokens > max_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += previous_tokens
+            current = overlap
+            current_tokens = overlap_size
+
+        current.append(turn)
+        current_tokens += turn_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+async def summarize_chunk(chunk: str, index: int, total: int) -> str:
+    """Map step: dense notes for one chunk of a transcript."""
+    response = await create_chat_completion(
+        model=SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": "You condense meeting transcripts into dense, factual notes without losing details."},
+            {"role": "user", "content": f"""
+            Summarize part {index} of {total} of a meeting transcript as concise notes.
+            Keep speaker names, decisions, action items with their owners and deadlines, numbers and open questions.
+            Respond with plain text notes only.
+
+            ---
+            {chunk}
+            ---
+            """}
+        ],
+        temperature=0.2,
+        max_tokens=700,
+        stage="transcript_map"
+    )
+    return response.choices[0].message.content.strip()
+
+
+async def reduce_notes(notes: List[str]) -> str:
+    """Reduce step: merges per-chunk notes into one chronological digest."""
+    numbered_notes = "\n\n".join(f"### Part {i}\n{note}" for i, note in enumerate(notes, start=1))
+    response = await create_chat_completion(
+        model=SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": "You merge partial meeting notes into one coherent, complete digest."},
+            {"role": "user", "content": f"""
+            Merge these consecutive parts of one meeting's notes into a single chronological digest.
+            Remove repetition from overlapping parts, but keep every decision, action item (with owner and deadline),
+            number and open question. Respond with plain text only.
+
+            {numbered_notes}
+            """}
+        ],
+        temperature=0.2,
+        max_tokens=1500,
+        stage="transcript_reduce"
+    )
+    return response.choices[0].message.content.strip()
+
+
+def group_notes(notes: List[str], budget: int) -> List[List[str]]:
+    """
+    Splits consecutive notes into groups of at most `budget` tokens for one reduce call each.
+    
+    A group always takes at least two notes when there are two left, even over the budget,
+    so every reduce round shrinks the number of notes.
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for note in notes:
+        note_tokens = count_tokens(note)
+        if len(current) >= 2 and current_tokens + note_tokens > budget:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(note)
+        current_tokens += note_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def condense_transcript(transcript: str, budget: int = TRANSCRIPT_TOKEN_BUDGET) -> str:
+    """
+    Map-reduces a long transcript into one digest. Each reduce call gets at most about `budget`
+    tokens of notes; the digest is bounded by the reduce step's output limit, not by `budget`.
+    """
+    chunks = chunk_transcript(transcript)
+    logger.info(f"Condensing transcript: {len(chunks)} chunks")
+    notes = await asyncio.gather(*[
+        summarize_chunk(chunk, index, len(chunks)) for index, chunk in enumerate(chunks, start=1)
+    ])
+    while True:
+        groups = group_notes(list(notes), budget)
+        notes = await asyncio.gather(*[reduce_notes(group) for group in groups])
+        if len(notes) == 1:
+            return notes[0]
+        logger.info(f"Condensing transcript: merging {len(notes)} partial digests")
+
+
+# Digests by transcript hash; in-flight tasks are shared so concurrent
+# recipients of the same meeting condense it only once
+_digest_tasks: "OrderedDict[str, asyncio.Future]" = OrderedDict()
+_DIGEST_TASKS_MAX = 32
+
+
+async def prepare_transcript(transcript: str, budget: int = TRANSCRIPT_TOKEN_BUDGET) -> str:
+    """
+    Returns text to put in a prompt in place of `transcript`: the transcript itself
+    if it fits in `budget` tokens, otherwise a map-reduced digest of it.
+    """
+    if not transcript or count_tokens(transcript) <= budget:
+        return transcript
+
+    key = hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+    task = _digest_tasks.get(key)
+    if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+        task = asyncio.ensure_future(condense_transcript(transcript, budget))
+        _digest_tasks[key] = task
+        while len(_digest_tasks) > _DIGEST_TASKS_MAX:
+            _digest_tasks.popitem(last=False)
+    else:
+        _digest_tasks.move_to_end(key)
+
+    digest = await asyncio.shield(task)
+    return f"[Condensed digest of a long transcript]\n{digest}"
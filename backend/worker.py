@@ -0,0 +1,79 @@
+"""
+Standalone email delivery worker.
+
+Runs the same dispatch loop that the API starts in its lifespan (`EmailDispatcher`
+in main.py), for deployments where the API can't keep a background task alive, such
+as the Vercel functions, which run with the lifespan off and otherwise only deliver
+what each report request drains inline (EMAIL_INLINE_DRAIN_PAGES). Claims are leased, so a
+worker and API dispatchers can run side by side without delivering an email twice;
+set EMAIL_DISPATCHER=0 on the API to leave delivery to the worker alone.
+
+A worker in its own process isn't woken when a request queues mail, so it picks
+new rows up on its next poll; lower --interval for faster pickup.
+
+Usage:
+    python backend/worker.py                          # dispatch until interrupted
+    python backend/worker.py --interval 2 --batch-size 100
+    python backend/worker.py --once                   # drain the queue once and exit (e.g. from cron)
+"""
+import sys
+import json
+import signal
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import db  # noqa: E402
+import main  # noqa: E402
+
+
+async def drain_once(batch_size: int) -> dict:
+    """Delivers everything currently due, then closes the clients."""
+    await main.start_webhook_client()
+    try:
+        return await main.send_pending_emails(page_size=batch_size)
+    finally:
+        await main.close_webhook_client()
+        await db.close_client()
+
+
+async def dispatch_forever(interval: float, batch_size: int):
+    """Runs the dispatcher until SIGINT or SIGTERM, letting the in-flight batch finish."""
+    await main.start_webhook_client()
+    dispatcher = main.EmailDispatcher(interval, batch_size)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stopping.set)
+        except NotImplementedError:
+            # Windows: Ctrl+C still interrupts the loop
+            pass
+
+    dispatcher.start()
+    try:
+        await stopping.wait()
+    finally:
+        await dispatcher.stop()
+        await main.close_webhook_client()
+        await db.close_client()
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interval", type=float, default=main.EMAIL_DISPATCH_INTERVAL_SECONDS, help="seconds between polls of an idle queue")
+    parser.add_argument("--batch-size", type=int, default=main.EMAIL_DISPATCH_BATCH_SIZE, help="emails claimed per batch")
+    parser.add_argument("--once", action="store_true", help="drain the queue once and exit")
+    args = parser.parse_args()
+
+    if args.once:
+        result = asyncio.run(drain_once(args.batch_size))
+        print(json.dumps(result, indent=2))
+        sys.exit(1 if "error" in result else 0)
+    asyncio.run(dispatch_forever(args.interval, args.batch_size))
+
+
+if __name__ == "__main__":
+    run()
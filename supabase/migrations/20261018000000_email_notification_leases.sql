@@ -0,0 +1,38 @@
+-- Lease-based claiming of email_notifications so several senders can drain
+-- the queue concurrently without delivering the same email twice.
+
+alter table public.email_notifications
+  add column if not exists lease_owner text,
+  add column if not exists lease_expires_at timestamptz;
+
+create index if not exists email_notifications_claim_idx
+  on public.email_notifications (status, created_at, id);
+
+-- Atomically claims up to p_limit deliverable rows for p_owner.
+-- A row is deliverable when it is pending, or when it is 'sending' but the
+-- previous owner's lease has expired (crashed or timed-out sender).
+create or replace function public.claim_email_notifications(
+  p_owner text,
+  p_limit integer default 50,
+  p_lease_seconds integer default 300
+)
+returns setof public.email_notifications
+language sql
+as $$
+  with claimable as (
+    select id
+    from public.email_notifications
+    where status = 'pending'
+       or (status = 'sending' and lease_expires_at < now())
+    order by created_at, id
+    limit p_limit
+    for update skip locked
+  )
+  update public.email_notifications e
+  set status = 'sending',
+      lease_owner = p_owner,
+      lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+  from claimable
+  where e.id = claimable.id
+  returning e.*;
+$$;
@@ -0,0 +1,49 @@
+-- Keyset-paginated, column-projected claiming of email_notifications.
+-- Each call claims the next page after (p_after_created_at, p_after_id) and
+-- returns only the columns the sender needs, ordered by (created_at, id).
+
+drop function if exists public.claim_email_notifications(text, integer, integer);
+
+create index if not exists email_notifications_pending_keyset_idx
+  on public.email_notifications (created_at, id)
+  where status in ('pending', 'sending');
+
+create or replace function public.claim_email_notifications(
+  p_owner text,
+  p_limit integer default 50,
+  p_lease_seconds integer default 300,
+  p_after_created_at timestamptz default null,
+  p_after_id public.email_notifications.id%type default null
+)
+returns table (
+  id public.email_notifications.id%type,
+  created_at public.email_notifications.created_at%type,
+  user_email public.email_notifications.user_email%type,
+  from_email public.email_notifications.from_email%type,
+  subject public.email_notifications.subject%type,
+  html_content public.email_notifications.html_content%type
+)
+language sql
+as $$
+  with claimable as (
+    select e.id
+    from public.email_notifications e
+    where (e.status = 'pending'
+           or (e.status = 'sending' and e.lease_expires_at < now()))
+      and (p_after_created_at is null
+           or (e.created_at, e.id) > (p_after_created_at, p_after_id))
+    order by e.created_at, e.id
+    limit p_limit
+    for update skip locked
+  ),
+  claimed as (
+    update public.email_notifications e
+    set status = 'sending',
+        lease_owner = p_owner,
+        lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+    from claimable
+    where e.id = claimable.id
+    returning e.id, e.created_at, e.user_email, e.from_email, e.subject, e.html_content
+  )
+  select * from claimed order by created_at, id;
+$$;
@@ -0,0 +1,11 @@
+-- Once-per-meeting structured transcript analysis, reused by every recipient's
+-- email and by repeated report runs while the transcript is unchanged.
+
+create table if not exists public.meeting_analyses (
+  meeting_id uuid primary key references public.meetings (id) on delete cascade,
+  transcript_hash text not null,
+  model text not null,
+  analysis jsonb not null,
+  created_at timestamptz not null default now(),
+  updated_at timestamptz not null default now()
+);
@@ -0,0 +1,16 @@
+-- Deduplicate generated emails: each row records a fingerprint of the inputs
+-- its content was generated from, and the same inputs for the same meeting and
+-- recipient can only be queued once. Rows from before this migration have no
+-- fingerprint and are unaffected (NULLs never conflict).
+
+alter table public.email_notifications
+  add column if not exists input_fingerprint text,
+  add column if not exists idempotency_key text;
+
+-- Not partial, so PostgREST upserts can target it with on_conflict
+create unique index if not exists email_notifications_input_fingerprint_key
+  on public.email_notifications (meeting_id, user_email, input_fingerprint);
+
+create index if not exists email_notifications_idempotency_key_idx
+  on public.email_notifications (meeting_id, idempotency_key)
+  where idempotency_key is not null;
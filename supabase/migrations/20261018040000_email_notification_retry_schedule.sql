@@ -0,0 +1,53 @@
+-- Retry scheduling for email delivery. A failed send that is worth retrying
+-- goes back to 'pending' with next_attempt_at set by the sender's backoff;
+-- claims skip rows whose next attempt is still in the future. Every claim
+-- counts as an attempt, so the sender can stop retrying after a maximum.
+
+alter table public.email_notifications
+  add column if not exists attempt_count integer not null default 0,
+  add column if not exists next_attempt_at timestamptz;
+
+-- The return type changes, so the function has to be recreated
+drop function if exists public.claim_email_notifications(text, integer, integer, timestamptz, public.email_notifications.id%type);
+
+create or replace function public.claim_email_notifications(
+  p_owner text,
+  p_limit integer default 50,
+  p_lease_seconds integer default 300,
+  p_after_created_at timestamptz default null,
+  p_after_id public.email_notifications.id%type default null
+)
+returns table (
+  id public.email_notifications.id%type,
+  created_at public.email_notifications.created_at%type,
+  user_email public.email_notifications.user_email%type,
+  from_email public.email_notifications.from_email%type,
+  subject public.email_notifications.subject%type,
+  html_content public.email_notifications.html_content%type,
+  attempt_count public.email_notifications.attempt_count%type
+)
+language sql
+as $$
+  with claimable as (
+    select e.id
+    from public.email_notifications e
+    where ((e.status = 'pending' and (e.next_attempt_at is null or e.next_attempt_at <= now()))
+           or (e.status = 'sending' and e.lease_expires_at < now()))
+      and (p_after_created_at is null
+           or (e.created_at, e.id) > (p_after_created_at, p_after_id))
+    order by e.created_at, e.id
+    limit p_limit
+    for update skip locked
+  ),
+  claimed as (
+    update public.email_notifications e
+    set status = 'sending',
+        lease_owner = p_owner,
+        lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+        attempt_count = e.attempt_count + 1
+    from claimable
+    where e.id = claimable.id
+    returning e.id, e.created_at, e.user_email, e.from_email, e.subject, e.html_content, e.attempt_count
+  )
+  select * from claimed order by created_at, id;
+$$;
@@ -0,0 +1,17 @@
+-- Each user's newest meeting in one query, for batch reports that name a user
+-- but no meeting. Returns at most one row per email, however many meetings
+-- the users have, instead of every meeting the caller would then sort.
+
+create index if not exists meetings_user_email_created_at_idx
+  on public.meetings (user_email, created_at desc);
+
+create or replace function public.latest_meetings(p_user_emails text[])
+returns setof public.meetings
+language sql
+stable
+as $$
+  select distinct on (m.user_email) m.*
+  from public.meetings m
+  where m.user_email = any (p_user_emails)
+  order by m.user_email, m.created_at desc, m.id desc;
+$$;